@@ -0,0 +1,31 @@
+"""Кэш ответов каталога.
+
+Хранит в памяти процесса ответы эндпоинта статистики по фильтрам с
+коротким временем жизни. Кэш сбрасывается при создании и удалении товаров
+и свойств. Каждый сброс увеличивает номер поколения: ответ, посчитанный
+до сброса, не должен попасть в кэш после него.
+"""
+
+from typing import Any, Dict, Tuple
+
+from cachetools import TTLCache
+
+FILTER_CACHE_TTL = 30
+
+filter_cache: TTLCache[Tuple[Tuple[str, str], ...], Dict[str, Any]] = (
+    TTLCache(maxsize=1024, ttl=FILTER_CACHE_TTL)
+)
+
+_generation = 0
+
+
+def get_cache_generation() -> int:
+    """Возвращает номер текущего поколения кэша каталога."""
+    return _generation
+
+
+def invalidate_catalog_cache() -> None:
+    """Сбрасывает закэшированные ответы каталога."""
+    global _generation
+    _generation += 1
+    filter_cache.clear()
@@ -1,15 +1,17 @@
 """Модуль для настройки подключения к базе данных.
 
-Создает SQLAlchemy engine и sessionmaker, а также определяет функцию
-get_db для получения сессии БД.
+Создает асинхронный SQLAlchemy engine (asyncpg) и sessionmaker, а также
+определяет функцию get_db для получения сессии БД. SQL-запросы пишутся
+в лог только при ENV=dev.
 """
 
 import os
-from typing import Generator
+from typing import AsyncGenerator
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import make_url
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
 
 load_dotenv()
 
@@ -17,17 +19,34 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL is None:
     raise Exception('DATABASE_URL не установлен. Проверьте файл .env')
 
-engine = create_engine(DATABASE_URL, echo=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-
-def get_db() -> Generator[Session, None, None]:
+DEBUG = os.getenv('ENV') == 'dev'
+
+database_url = make_url(DATABASE_URL)
+if database_url.get_backend_name() == 'postgresql':
+    # Строки вида postgresql:// из старых .env переводим на asyncpg.
+    database_url = database_url.set(drivername='postgresql+asyncpg')
+
+engine = create_async_engine(
+    database_url,
+    echo=DEBUG,
+    query_cache_size=1200,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    pool_size=20,
+    max_overflow=40
+)
+SessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Возвращает сессию БД для зависимостей FastAPI.
 
     Гарантирует закрытие сессии после использования.
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,58 @@
+"""Материализованное представление с агрегатами по свойствам товаров.
+
+pp_facets хранит для каждой пары (property_uid, value_uid) число товаров,
+а для свойств типа int - минимальное и максимальное значение. Используется
+эндпоинтом статистики каталога, когда фильтры не заданы, и обновляется
+после создания и удаления товаров до отправки ответа клиенту.
+"""
+
+from sqlalchemy import column, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.cache import invalidate_catalog_cache
+from app.database import engine
+
+pp_facets = table(
+    'pp_facets',
+    column('property_uid'),
+    column('value_uid'),
+    column('n'),
+    column('min_value'),
+    column('max_value')
+)
+
+CREATE_FACETS_VIEW = (
+    text(
+        'CREATE MATERIALIZED VIEW IF NOT EXISTS pp_facets AS '
+        'SELECT property_uid, value_uid, COUNT(*) AS n, '
+        'MIN(int_value) AS min_value, MAX(int_value) AS max_value '
+        'FROM product_properties GROUP BY property_uid, value_uid'
+    ),
+    text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_pp_facets_property_value '
+        'ON pp_facets (property_uid, value_uid)'
+    ),
+)
+
+
+async def create_facets_view(conn: AsyncConnection) -> None:
+    """Создает представление pp_facets и его индекс, если их еще нет.
+
+    Параметры:
+        conn (AsyncConnection): Соединение с открытой транзакцией.
+    """
+    for statement in CREATE_FACETS_VIEW:
+        await conn.execute(statement)
+
+
+async def refresh_facets() -> None:
+    """Пересчитывает pp_facets, не блокируя чтение представления.
+
+    После обновления сбрасывает кэш каталога, чтобы в нем не осталось
+    ответов, посчитанных по старым данным.
+    """
+    async with engine.begin() as conn:
+        await conn.execute(
+            text('REFRESH MATERIALIZED VIEW CONCURRENTLY pp_facets')
+        )
+    invalidate_catalog_cache()
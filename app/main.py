@@ -1,18 +1,119 @@
 """Основной модуль приложения Catalog API.
 
 Инициирует создание базы данных, FastAPI и подключает маршруты для работы
-с каталогом, товарами и свойствами.
+с каталогом, товарами и свойствами. При ENV=dev в лог предупреждением
+пишутся ленивые загрузки связей и запросы к API, выполнившие больше
+SQL-запросов, чем допускает QUERY_LIMITS для их пути (по умолчанию
+MAX_QUERIES_PER_REQUEST), - возможный N+1.
 """
 
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
 
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.database import DEBUG, engine
+from app.facets import create_facets_view, refresh_facets
+from app.models import Base
 from app.routers import catalog, product, properties
 from app.seed_data import load_seed_data
 
-load_seed_data()
+logger = logging.getLogger(__name__)
+
+STARTUP_LOCK_ID = 724158301
+MAX_QUERIES_PER_REQUEST = 5
+MAX_CATALOG_QUERIES = 4
+# Создание товара: проверка uid, свойства и их значения, два INSERT и
+# обновление pp_facets - 6 запросов при любом числе свойств.
+QUERY_LIMITS = {'/catalog/': MAX_CATALOG_QUERIES, '/product/': 6}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Готовит БД при старте и закрывает пул при остановке.
+
+    Создает таблицы и представление pp_facets, загружает тестовые данные
+    и пересчитывает pp_facets. Все шаги выполняются под advisory-локом,
+    поэтому воркеры, запущенные одновременно, не выполняют их параллельно.
+    """
+    async with engine.connect() as lock_conn:
+        await lock_conn.execute(
+            select(func.pg_advisory_lock(STARTUP_LOCK_ID))
+        )
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await create_facets_view(conn)
+            await load_seed_data()
+            await refresh_facets()
+        finally:
+            await lock_conn.execute(
+                select(func.pg_advisory_unlock(STARTUP_LOCK_ID))
+            )
+    yield
+    await engine.dispose()
 
-app = FastAPI(title='Catalog API')
+
+app = FastAPI(
+    title='Catalog API',
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
 
 app.include_router(catalog.router)
 app.include_router(product.router)
 app.include_router(properties.router)
+
+if DEBUG:
+    @event.listens_for(Session, 'do_orm_execute')
+    def warn_lazy_load(orm_execute_state: ORMExecuteState) -> None:
+        """Предупреждает о ленивой загрузке связи (возможный N+1)."""
+        if not orm_execute_state.is_select:
+            return
+        state = orm_execute_state.lazy_loaded_from
+        if state is not None:
+            logger.warning(
+                'Ленивая загрузка связи у %s: %s',
+                state.class_.__name__,
+                orm_execute_state.statement
+            )
+
+    query_count: ContextVar[Optional[List[int]]] = ContextVar(
+        'query_count',
+        default=None
+    )
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def count_query(*args: object) -> None:
+        """Увеличивает счетчик SQL-запросов текущего запроса к API."""
+        counter = query_count.get()
+        if counter is not None:
+            counter[0] += 1
+
+    @app.middleware('http')
+    async def warn_query_count(
+            request: Request,
+            call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        """Предупреждает, если запрос к API выполнил слишком много SQL."""
+        counter = [0]
+        token = query_count.set(counter)
+        try:
+            response = await call_next(request)
+        finally:
+            query_count.reset(token)
+        limit = QUERY_LIMITS.get(request.url.path, MAX_QUERIES_PER_REQUEST)
+        if counter[0] > limit:
+            logger.warning(
+                '%s %s выполнил %d SQL-запросов (больше %d)',
+                request.method,
+                request.url.path,
+                counter[0],
+                limit
+            )
+        return response
@@ -6,14 +6,11 @@
 
 import enum
 
-from sqlalchemy import Enum, ForeignKey, Integer, String
+from sqlalchemy import Enum, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import (Mapped, declarative_base, mapped_column,
                             relationship)
 
-from app.database import engine
-
 Base = declarative_base()
-Base.metadata.create_all(bind=engine)
 
 
 class PropertyType(enum.Enum):
@@ -61,6 +58,9 @@ class PropertyValue(Base):
         property: Связь с моделью Property.
     """
     __tablename__ = 'property_values'
+    __table_args__ = (
+        Index('ix_pv_property_value', 'property_uid', 'value_uid'),
+    )
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -109,6 +109,12 @@ class ProductProperty(Base):
         property: Связь с моделью Property.
     """
     __tablename__ = 'product_properties'
+    __table_args__ = (
+        Index('ix_pp_property_value', 'property_uid', 'value_uid',
+              'product_uid'),
+        Index('ix_pp_property_intval', 'property_uid', 'int_value'),
+        Index('ix_pp_product', 'product_uid'),
+    )
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
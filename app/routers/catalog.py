@@ -1,47 +1,208 @@
 """Маршруты для работы с каталогом товаров.
 
 Содержит эндпоинты для получения каталога с пагинацией и фильтрацией, а также
-утилиту для получения текстового значения свойства.
+утилиты для разбора и применения фильтров по свойствам.
 """
 
-from typing import Any, Dict, Optional
+import base64
+import binascii
+import json
+import re
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, Query, Request
-from sqlalchemy.orm import Session, aliased, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Select, and_, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import filter_cache, get_cache_generation
 from app.database import get_db
-from app.models import Product, ProductProperty, Property, PropertyType
+from app.facets import pp_facets
+from app.models import (Product, ProductProperty, Property, PropertyType,
+                        PropertyValue)
 
 router = APIRouter(prefix='/catalog', tags=['catalog'])
 
+PROPERTY_FILTER_RE = re.compile(r'^property_(.+?)(?:_(from|to))?$')
 
-def get_property_value(
-        property_obj: Property,
-        value_uid: str
-) -> Optional[str]:
-    """Возвращает текстовое значение свойства по value_uid.
+
+def parse_property_filters(
+        params: Iterable[Tuple[str, str]]
+) -> Dict[str, Dict[str, Any]]:
+    """Разбирает параметры запроса с префиксом "property_" в фильтры.
+
+    Параметр property_<uid>_from/property_<uid>_to задает границу для
+    свойства типа int, property_<uid> - значение для свойства типа list.
+
+    Параметры:
+        params: Пары (ключ, значение) параметров запроса.
+        Возвращает:
+        Словарь {prop_uid: {'from', 'to', 'values'}}.
+    """
+    filters: Dict[str, Dict[str, Any]] = {}
+    for key, value in params:
+        match = PROPERTY_FILTER_RE.match(key)
+        if not match:
+            continue
+        prop_uid, bound = match.group(1, 2)
+        condition = filters.setdefault(
+            prop_uid,
+            {'from': None, 'to': None, 'values': []}
+        )
+        if bound:
+            condition[bound] = value
+        else:
+            condition['values'].append(value)
+    return filters
+
+
+def encode_cursor(name: str, uid: str) -> str:
+    """Кодирует ключ сортировки последнего товара страницы в курсор.
+
+    Параметры:
+        name (str): Название товара.
+        uid (str): Уникальный идентификатор товара.
+    Возвращает:
+        Непрозрачную строку (base64 от JSON [name, uid]).
+    """
+    raw = json.dumps([name, uid], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Декодирует курсор, полученный от encode_cursor.
+
+    Параметры:
+        cursor (str): Курсор из next_cursor предыдущего ответа.
+    Возвращает:
+        Пару (name, uid) последнего товара предыдущей страницы.
+    Исключения:
+        HTTPException 400: Если курсор не удалось разобрать.
+    """
+    try:
+        name, uid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail='Неверный курсор')
+    if not isinstance(name, str) or not isinstance(uid, str):
+        raise HTTPException(status_code=400, detail='Неверный курсор')
+    return name, uid
+
+
+def apply_property_filters(
+        query: Select,
+        filters: Dict[str, Dict[str, Any]]
+) -> Select:
+    """Ограничивает запрос товаров фильтрами по свойствам.
+
+    Все фильтры проверяются одним подзапросом к product_properties:
+    товар подходит, если для него совпало столько разных свойств,
+    сколько задано фильтров.
+
+    Параметры:
+        query (Select): Запрос товаров.
+        filters (dict): Условия {prop_uid: {'from', 'to', 'values'}}.
+        Возвращает:
+        Запрос, отфильтрованный по свойствам.
+    """
+    if not filters:
+        return query
+    clauses = []
+    for prop_uid, condition in filters.items():
+        clause = [ProductProperty.property_uid == prop_uid]
+        if condition['values']:
+            clause.append(ProductProperty.value_uid.in_(condition['values']))
+        else:
+            if condition['from']:
+                clause.append(
+                    ProductProperty.int_value >= int(condition['from'])
+                )
+            if condition['to']:
+                clause.append(
+                    ProductProperty.int_value <= int(condition['to'])
+                )
+        clauses.append(and_(*clause))
+    matched = select(ProductProperty.product_uid).where(
+        or_(*clauses)
+    ).group_by(ProductProperty.product_uid).having(
+        func.count(func.distinct(ProductProperty.property_uid))
+        == len(filters)
+    )
+    return query.where(Product.uid.in_(matched))
+
+
+async def get_filtered_facets(
+        db: AsyncSession,
+        product_ids: Select
+) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, Any]]]:
+    """Считает статистику по свойствам для отфильтрованных товаров.
+
+    Параметры:
+        db (AsyncSession): Сессия БД.
+        product_ids (Select): Запрос uid отфильтрованных товаров.
+        Возвращает:
+        Число товаров по значениям list-свойств и границы int-свойств.
+    """
+    value_counts: Dict[str, Dict[str, int]] = {}
+    for prop_uid, value_uid, count in await db.execute(select(
+        ProductProperty.property_uid,
+        ProductProperty.value_uid,
+        func.count()
+    ).where(
+        ProductProperty.product_uid.in_(product_ids),
+        ProductProperty.value_uid.isnot(None)
+    ).group_by(ProductProperty.property_uid, ProductProperty.value_uid)):
+        value_counts.setdefault(prop_uid, {})[value_uid] = count
+    int_ranges = {
+        prop_uid: {'min_value': min_value, 'max_value': max_value}
+        for prop_uid, min_value, max_value in await db.execute(select(
+            ProductProperty.property_uid,
+            func.min(ProductProperty.int_value),
+            func.max(ProductProperty.int_value)
+        ).where(
+            ProductProperty.product_uid.in_(product_ids),
+            ProductProperty.int_value.isnot(None)
+        ).group_by(ProductProperty.property_uid))
+    }
+    return value_counts, int_ranges
+
+
+async def get_all_facets(
+        db: AsyncSession
+) -> Tuple[Dict[str, Dict[str, int]], Dict[str, Dict[str, Any]]]:
+    """Читает статистику по свойствам всех товаров из pp_facets.
 
     Параметры:
-        property_obj (Property): Объект свойства с допустимыми значениями.
-        value_uid (str): Идентификатор значения.
+        db (AsyncSession): Сессия БД.
         Возвращает:
-        Текстовое представление значения или None.
+        Число товаров по значениям list-свойств и границы int-свойств.
     """
-    for pv in property_obj.values:
-        if pv.value_uid == value_uid:
-            return pv.value
-    return None
+    value_counts: Dict[str, Dict[str, int]] = {}
+    int_ranges: Dict[str, Dict[str, Any]] = {}
+    for row in await db.execute(select(pp_facets)):
+        if row.value_uid is not None:
+            value_counts.setdefault(row.property_uid, {})[row.value_uid] = (
+                row.n
+            )
+        elif row.min_value is not None:
+            int_ranges[row.property_uid] = {
+                'min_value': row.min_value,
+                'max_value': row.max_value
+            }
+    return value_counts, int_ranges
 
 
-@router.get('/', response_model=Dict[str, Any])
-def get_catalog(
+@router.get('/')
+async def get_catalog(
     request: Request,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1),
     name: Optional[str] = Query(None),
     sort: str = Query('uid', regex='^(uid|name)$'),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """Получает список товаров (каталог) с пагинацией и фильтрами.
 
     Параметры запроса:
@@ -49,87 +210,103 @@ def get_catalog(
         page_size (int): Количество товаров на странице.
         name (str, optional): Фильтр по имени товара.
         sort (str): Сортировка ("uid" или "name").
+        cursor (str, optional): next_cursor из предыдущего ответа. Если
+            задан, страница выбирается по ключу (keyset) вместо OFFSET,
+            page игнорируется, а count не считается и равен None.
         Дополнительные параметры с префиксом "property_" для фильтрации.
         Возвращает:
-        Словарь с ключами "products" (список товаров) и "count" (общее число).
+        Словарь с ключами "products" (список товаров), "count" (общее
+        число) и "next_cursor" (курсор следующей страницы или None).
+    Исключения:
+        HTTPException 400: Если курсор не удалось разобрать.
     """
-    query = db.query(Product)
+    query = select(Product.uid, Product.name)
     if name:
-        query = query.filter(Product.name.ilike(f'%{name}%'))
-    filters: Dict[str, Dict[str, Any]] = {}
-    for key, value in request.query_params.items():
-        if key.startswith('property_'):
-            parts = key.split('_')
-            if parts[-1] in ['from', 'to']:
-                prop_uid = '_'.join(parts[1:-1])
-                if prop_uid not in filters:
-                    filters[prop_uid] = {
-                        'from': None,
-                        'to': None,
-                        'values': []
-                    }
-                filters[prop_uid][parts[-1]] = value
-            else:
-                prop_uid = '_'.join(parts[1:])
-                if prop_uid not in filters:
-                    filters[prop_uid] = {
-                        'from': None,
-                        'to': None,
-                        'values': []
-                    }
-                filters[prop_uid]['values'].append(value)
-    for prop_uid, condition in filters.items():
-        pp_alias = aliased(ProductProperty)
-        query = query.join(
-            pp_alias,
-            Product.uid == pp_alias.product_uid
-        ).filter(pp_alias.property_uid == prop_uid)
-        if condition['values']:
-            query = query.filter(pp_alias.value_uid.in_(condition['values']))
-        else:
-            if condition['from']:
-                query = query.filter(
-                    pp_alias.int_value >= int(condition['from'])
-                )
-            if condition['to']:
-                query = query.filter(
-                    pp_alias.int_value <= int(condition['to'])
-                )
+        query = query.where(Product.name.ilike(f'%{name}%'))
+    filters = parse_property_filters(request.query_params.items())
+    query = apply_property_filters(query, filters)
     if sort == 'name':
-        query = query.order_by(Product.name)
+        query = query.order_by(Product.name, Product.uid)
     else:
         query = query.order_by(Product.uid)
-    total_count = query.distinct().count()
-    products = query.options(
-        joinedload(Product.properties).joinedload(ProductProperty.property)
-    ).offset((page - 1) * page_size).limit(page_size).all()
-    result_products = []
-    for prod in products:
-        prop_list = []
-        for pp in prod.properties:
-            prop_data = {'uid': pp.property.uid, 'name': pp.property.name}
-            if pp.property.type == PropertyType.list:
-                prop_data['value_uid'] = pp.value_uid
-                prop_data['value'] = get_property_value(
-                    pp.property, pp.value_uid
-                ) if pp.value_uid else None
-            else:
-                prop_data['value'] = pp.int_value
-            prop_list.append(prop_data)
-        result_products.append({
-            'uid': prod.uid,
-            'name': prod.name,
-            'properties': prop_list
-        })
-    return {'products': result_products, 'count': total_count}
-
-
-@router.get('/filter/', response_model=Dict[str, Any])
-def catalog_filter(
+    if cursor is not None:
+        cursor_name, cursor_uid = decode_cursor(cursor)
+        if sort == 'name':
+            query = query.where(
+                tuple_(Product.name, Product.uid)
+                > tuple_(cursor_name, cursor_uid)
+            )
+        else:
+            query = query.where(Product.uid > cursor_uid)
+        rows = (await db.execute(query.limit(page_size))).all()
+        total_count = None
+    else:
+        rows = (await db.execute(query.add_columns(
+            func.count().over().label('total_count')
+        ).offset((page - 1) * page_size).limit(page_size))).all()
+        if rows:
+            total_count = rows[0].total_count
+        elif page > 1:
+            # Страница за пределами выборки: общее число берем отдельно.
+            total_count = await db.scalar(
+                select(func.count()).select_from(query.subquery())
+            )
+        else:
+            total_count = 0
+    next_cursor = encode_cursor(
+        rows[-1].name, rows[-1].uid
+    ) if len(rows) == page_size else None
+    prop_lists: Dict[str, List[Dict[str, Any]]] = {
+        row.uid: [] for row in rows
+    }
+    if prop_lists:
+        prop_rows = await db.execute(select(
+            ProductProperty.product_uid,
+            ProductProperty.property_uid,
+            Property.name,
+            Property.type,
+            ProductProperty.value_uid,
+            PropertyValue.value,
+            ProductProperty.int_value
+        ).join(
+            Property,
+            Property.uid == ProductProperty.property_uid
+        ).outerjoin(PropertyValue, and_(
+            PropertyValue.property_uid == ProductProperty.property_uid,
+            PropertyValue.value_uid == ProductProperty.value_uid
+        )).where(
+            ProductProperty.product_uid.in_(list(prop_lists))
+        ).order_by(ProductProperty.product_uid, ProductProperty.id))
+        for product_uid, group in groupby(
+                prop_rows.mappings(),
+                key=itemgetter('product_uid')
+        ):
+            prop_list = prop_lists[product_uid]
+            for pp in group:
+                prop_data = {'uid': pp['property_uid'], 'name': pp['name']}
+                if pp['type'] == PropertyType.list:
+                    prop_data['value_uid'] = pp['value_uid']
+                    prop_data['value'] = pp['value']
+                else:
+                    prop_data['value'] = pp['int_value']
+                prop_list.append(prop_data)
+    result_products = [
+        {'uid': row.uid, 'name': row.name, 'properties': prop_lists[row.uid]}
+        for row in rows
+    ]
+    return ORJSONResponse({
+        'products': result_products,
+        'count': total_count,
+        'next_cursor': next_cursor
+    })
+
+
+@router.get('/filter/')
+async def catalog_filter(
     request: Request,
     name: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
+    db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """Получает статистику по фильтрам каталога товаров.
 
     Параметры запроса:
@@ -137,72 +314,37 @@ def catalog_filter(
         Дополнительные параметры с префиксом "property_".
         Возвращает:
         Словарь с числом товаров и статистикой для каждого свойства.
+        Без фильтров статистика читается из представления pp_facets.
+        Ответ кратковременно кэшируется (см. app.cache), если кэш не
+        сбрасывали, пока он считался.
     """
-    query = db.query(Product)
+    cache_key = tuple(sorted(request.query_params.multi_items()))
+    cached = filter_cache.get(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
+    generation = get_cache_generation()
+    query = select(Product.uid)
     if name:
-        query = query.filter(Product.name.ilike(f'%{name}%'))
-    filters: Dict[str, Dict[str, Any]] = {}
-    for key, value in request.query_params.items():
-        if key.startswith('property_'):
-            parts = key.split('_')
-            if parts[-1] in ['from', 'to']:
-                prop_uid = '_'.join(parts[1:-1])
-                if prop_uid not in filters:
-                    filters[prop_uid] = {
-                        'from': None,
-                        'to': None,
-                        'values': []
-                    }
-                filters[prop_uid][parts[-1]] = value
-            else:
-                prop_uid = '_'.join(parts[1:])
-                if prop_uid not in filters:
-                    filters[prop_uid] = {
-                        'from': None,
-                        'to': None,
-                        'values': []
-                    }
-                filters[prop_uid]['values'].append(value)
-    for prop_uid, condition in filters.items():
-        pp_alias = aliased(ProductProperty)
-        query = query.join(
-            pp_alias,
-            Product.uid == pp_alias.product_uid
-        ).filter(pp_alias.property_uid == prop_uid)
-        if condition['values']:
-            query = query.filter(pp_alias.value_uid.in_(condition['values']))
-        else:
-            if condition['from']:
-                query = query.filter(
-                    pp_alias.int_value >= int(condition['from'])
-                )
-            if condition['to']:
-                query = query.filter(
-                    pp_alias.int_value <= int(condition['to'])
-                )
-    filtered_products = query.distinct().all()
-    product_ids = [p.uid for p in filtered_products]
-    result = {'count': len(filtered_products)}
-    properties = db.query(Property).all()
-    for prop in properties:
-        q = db.query(ProductProperty).filter(
-            ProductProperty.product_uid.in_(product_ids),
-            ProductProperty.property_uid == prop.uid
-        )
-        if prop.type == PropertyType.list:
-            groups = {}
-            for pp in q.all():
-                groups[pp.value_uid] = groups.get(pp.value_uid, 0) + 1
-            result[prop.uid] = groups
+        query = query.where(Product.name.ilike(f'%{name}%'))
+    filters = parse_property_filters(request.query_params.items())
+    product_ids = apply_property_filters(query, filters)
+    result: Dict[str, Any] = {'count': await db.scalar(
+        select(func.count()).select_from(product_ids.subquery())
+    )}
+    if name or filters:
+        value_counts, int_ranges = await get_filtered_facets(db, product_ids)
+    else:
+        value_counts, int_ranges = await get_all_facets(db)
+    for prop_uid, prop_type in await db.execute(
+        select(Property.uid, Property.type)
+    ):
+        if prop_type == PropertyType.list:
+            result[prop_uid] = value_counts.get(prop_uid, {})
         else:
-            values = [
-                pp.int_value for pp in q.all() if pp.int_value is not None
-            ]
-            if values:
-                result[prop.uid] = {
-                    'min_value': min(values),
-                    'max_value': max(values)
-                }
-            else:
-                result[prop.uid] = {'min_value': None, 'max_value': None}
-    return result
+            result[prop_uid] = int_ranges.get(
+                prop_uid, {'min_value': None, 'max_value': None}
+            )
+    # Если во время запросов кэш сбросили, результат мог устареть.
+    if get_cache_generation() == generation:
+        filter_cache[cache_key] = result
+    return ORJSONResponse(result)
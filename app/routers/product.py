@@ -4,12 +4,16 @@
 утилиту для извлечения текстового значения свойства.
 """
 
-from typing import Dict, Optional
+from typing import Dict, Iterable, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app.database import get_db
+from app.facets import refresh_facets
 from app.models import (Product, ProductProperty, Property, PropertyType,
                         PropertyValue)
 from app.schemas import ProductCreate, ProductSchema
@@ -17,76 +21,109 @@ from app.schemas import ProductCreate, ProductSchema
 router = APIRouter(prefix='/product', tags=['product'])
 
 
-def get_property_value(
-        property_obj: Property,
-        value_uid: str
-) -> Optional[str]:
-    """Возвращает текстовое значение свойства по value_uid.
+async def get_property_values(
+        db: AsyncSession,
+        pairs: Iterable[Tuple[str, str]]
+) -> Dict[Tuple[str, str], str]:
+    """Возвращает текстовые значения свойств одним запросом.
 
     Параметры:
-        property_obj (Property): Объект свойства с данными.
-        value_uid (str): Идентификатор значения.
+        db (AsyncSession): Сессия БД.
+        pairs: Пары (property_uid, value_uid), для которых нужны значения.
     Возвращает:
-        Текстовое значение, если найдено, иначе None.
+        Словарь {(property_uid, value_uid): value}.
     """
-    for pv in property_obj.values:
-        if pv.value_uid == value_uid:
-            return pv.value
-    return None
-
-
-@router.get('/{uid}', response_model=ProductSchema)
-def get_product(uid: str, db: Session = Depends(get_db)) -> ProductSchema:
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    rows = await db.execute(select(
+        PropertyValue.property_uid,
+        PropertyValue.value_uid,
+        PropertyValue.value
+    ).where(
+        tuple_(PropertyValue.property_uid, PropertyValue.value_uid).in_(pairs)
+    ))
+    return {(row.property_uid, row.value_uid): row.value for row in rows}
+
+
+@router.get(
+    '/{uid}',
+    response_model=None,
+    responses={200: {'model': ProductSchema}}
+)
+async def get_product(
+        uid: str,
+        db: AsyncSession = Depends(get_db)
+) -> ORJSONResponse:
     """Получает товар по его uid.
 
     Параметры:
         uid (str): Уникальный идентификатор товара.
-        db (Session): Сессия БД, получаемая через Depends.
+        db (AsyncSession): Сессия БД, получаемая через Depends.
     Возвращает:
-        Данные товара в виде словаря, соответствующего ProductSchema.
+        Данные товара в формате ProductSchema. Ответ собирается вручную
+        и не проходит повторную валидацию Pydantic.
     Исключения:
         HTTPException 404: Если товар не найден.
     """
-    product = db.query(Product).options(
-        joinedload(Product.properties).joinedload(ProductProperty.property)
-    ).filter(Product.uid == uid).first()
+    product = await db.scalar(select(Product).options(
+        selectinload(Product.properties)
+        .selectinload(ProductProperty.property)
+    ).where(Product.uid == uid))
     if not product:
         raise HTTPException(status_code=404, detail='Товар не найден')
+    values = await get_property_values(db, (
+        (pp.property_uid, pp.value_uid)
+        for pp in product.properties if pp.value_uid
+    ))
     prop_list = []
     for pp in product.properties:
         prop_data = {'uid': pp.property.uid, 'name': pp.property.name}
         if pp.property.type == PropertyType.list:
             prop_data['value_uid'] = pp.value_uid
-            prop_data['value'] = (get_property_value(pp.property, pp.value_uid)
-                                  if pp.value_uid else None)
+            prop_data['value'] = values.get((pp.property_uid, pp.value_uid))
         else:
+            prop_data['value_uid'] = None
             prop_data['value'] = pp.int_value
         prop_list.append(prop_data)
-    return {'uid': product.uid, 'name': product.name, 'properties': prop_list}
+    return ORJSONResponse(
+        {'uid': product.uid, 'name': product.name, 'properties': prop_list}
+    )
 
 
 @router.post('/', status_code=201)
-def create_product(product_in: ProductCreate,
-                   db: Session = Depends(get_db)) -> Dict[str, str]:
+async def create_product(
+        product_in: ProductCreate,
+        db: AsyncSession = Depends(get_db)
+) -> Dict[str, str]:
     """Создает новый товар.
 
     Параметры:
         product_in (ProductCreate): Данные товара со свойствами.
-        db (Session): Сессия БД, получаемая через Depends.
+        db (AsyncSession): Сессия БД, получаемая через Depends.
     Возвращает:
         Словарь с сообщением об успешном создании товара.
     Исключения:
         HTTPException 400: Если товар существует или указано неверное
                              свойство/значение.
     """
-    if db.query(Product).filter(Product.uid == product_in.uid).first():
+    if await db.get(Product, product_in.uid):
         raise HTTPException(
             status_code=400,
             detail='Товар с таким uid уже существует'
         )
-    product = Product(uid=product_in.uid, name=product_in.name)
+    uids = {prop.uid for prop in product_in.properties}
+    db_props = {
+        db_prop.uid: db_prop
+        for db_prop in await db.scalars(
+            select(Property).options(
+                selectinload(Property.values)
+            ).where(Property.uid.in_(uids))
+        )
+    } if uids else {}
+    rows = []
     for prop in product_in.properties:
-        db_prop = db.query(Property).filter(Property.uid == prop.uid).first()
+        db_prop = db_props.get(prop.uid)
         if not db_prop:
             raise HTTPException(
                 status_code=400,
@@ -98,50 +135,67 @@ def create_product(product_in: ProductCreate,
                     status_code=400,
                     detail=f'Для {prop.uid} необходимо указать value_uid'
                 )
-            valid = db.query(Property).join(Property.values).filter(
-                Property.uid == prop.uid,
-                PropertyValue.value_uid == prop.value_uid
-            ).first()
-            if not valid:
+            if not any(
+                    pv.value_uid == prop.value_uid for pv in db_prop.values
+            ):
                 raise HTTPException(
                     status_code=400,
                     detail=f'{prop.value_uid} для {prop.uid} недопустимо'
                 )
-            product_prop = ProductProperty(
-                property_uid=prop.uid,
-                value_uid=prop.value_uid
-            )
+            rows.append({
+                'product_uid': product_in.uid,
+                'property_uid': prop.uid,
+                'value_uid': prop.value_uid,
+                'int_value': None
+            })
         else:
             if prop.value is None:
                 raise HTTPException(
                     status_code=400,
                     detail=f'Для {prop.uid} необходимо указать значение'
                 )
-            product_prop = ProductProperty(
-                property_uid=prop.uid,
-                int_value=prop.value
-            )
-        product.properties.append(product_prop)
-    db.add(product)
-    db.commit()
+            rows.append({
+                'product_uid': product_in.uid,
+                'property_uid': prop.uid,
+                'value_uid': None,
+                'int_value': prop.value
+            })
+    db.add(Product(uid=product_in.uid, name=product_in.name))
+    await db.flush()
+    if rows:
+        # render_nulls: строки со свойствами list и int вставляются одним
+        # пакетом, а не отдельным INSERT на каждую смену набора колонок.
+        await db.execute(
+            insert(ProductProperty),
+            rows,
+            execution_options={'render_nulls': True}
+        )
+    await db.commit()
+    await refresh_facets()
     return {'message': 'Товар успешно создан'}
 
 
 @router.delete('/{uid}')
-def delete_product(uid: str, db: Session = Depends(get_db)) -> Dict[str, str]:
+async def delete_product(
+        uid: str,
+        db: AsyncSession = Depends(get_db)
+) -> Dict[str, str]:
     """Удаляет товар по его uid.
 
     Параметры:
         uid (str): Уникальный идентификатор товара.
-        db (Session): Сессия БД, получаемая через Depends.
+        db (AsyncSession): Сессия БД, получаемая через Depends.
     Возвращает:
         Словарь с сообщением об успешном удалении товара.
     Исключения:
         HTTPException 404: Если товар не найден.
     """
-    product = db.query(Product).filter(Product.uid == uid).first()
-    if not product:
+    result = await db.execute(
+        delete(Product).where(Product.uid == uid),
+        execution_options={'synchronize_session': False}
+    )
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail='Товар не найден')
-    db.delete(product)
-    db.commit()
+    await db.commit()
+    await refresh_facets()
     return {'message': 'Товар успешно удалён'}
@@ -6,8 +6,10 @@
 from typing import Dict
 
 from fastapi import APIRouter, Depends, HTTPException
-from virtualenv.run import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import invalidate_catalog_cache
 from app.database import get_db
 from app.models import Property, PropertyType, PropertyValue
 
@@ -15,9 +17,9 @@ router = APIRouter(prefix='/properties', tags=['properties'])
 
 
 @router.post('/', status_code=201)
-def create_property(
+async def create_property(
         prop_in: Dict,
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_db)
 ) -> Dict[str, str]:
     """Создает новое свойство.
 
@@ -36,7 +38,9 @@ def create_property(
             status_code=400,
             detail='Неверный тип свойства'
         )
-    if db.query(Property).filter(Property.uid == prop_in.get('uid')).first():
+    if await db.scalar(
+            select(Property.uid).where(Property.uid == prop_in.get('uid'))
+    ):
         raise HTTPException(
             status_code=400,
             detail='Свойство с таким uid уже существует'
@@ -69,12 +73,16 @@ def create_property(
             type=PropertyType.int
         )
         db.add(new_prop)
-    db.commit()
+    await db.commit()
+    invalidate_catalog_cache()
     return {'message': 'Свойство успешно создано'}
 
 
 @router.delete('/{uid}')
-def delete_property(uid: str, db: Session = Depends(get_db)) -> Dict[str, str]:
+async def delete_property(
+        uid: str,
+        db: AsyncSession = Depends(get_db)
+) -> Dict[str, str]:
     """Удаляет свойство по его uid.
 
     Параметры:
@@ -85,9 +93,12 @@ def delete_property(uid: str, db: Session = Depends(get_db)) -> Dict[str, str]:
     Исключения:
         HTTPException 404: Если свойство не найдено.
     """
-    prop = db.query(Property).filter(Property.uid == uid).first()
-    if not prop:
+    result = await db.execute(
+        delete(Property).where(Property.uid == uid),
+        execution_options={'synchronize_session': False}
+    )
+    if not result.rowcount:
         raise HTTPException(status_code=404, detail='Свойство не найдено')
-    db.delete(prop)
-    db.commit()
+    await db.commit()
+    invalidate_catalog_cache()
     return {'message': 'Свойство успешно удалено'}
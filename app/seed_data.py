@@ -1,89 +1,114 @@
 """Модуль загрузки тестовых данных в базу.
 
-Загружает данные из файла vacancy.json и вставляет их в БД, если база
-данных пуста.
+Загружает данные из файла vacancy.json и вставляет их в БД пакетными
+INSERT ... ON CONFLICT DO NOTHING, поэтому повторный запуск ничего не
+дублирует.
 """
 
 import json
 import os
 
+from sqlalchemy.dialects.postgresql import insert
+
 from app.database import SessionLocal
 from app.models import (Product, ProductProperty, Property, PropertyType,
                         PropertyValue)
 
 
-def load_seed_data() -> None:
+async def load_seed_data() -> None:
     """Загружает тестовые данные из vacancy.json в базу данных.
 
-    Если в БД уже присутствуют товары, загрузка не производится.
-    Если файл данных не найден, выводится сообщение об ошибке.
-    Сообщает об успехе или возникновении ошибки при загрузке.
+    Свойства и товары, уже присутствующие в БД, пропускаются вместе со
+    своими значениями и связями. Если файл данных не найден, выводится
+    сообщение об ошибке. Сообщает об успехе или возникновении ошибки при
+    загрузке.
     """
-    session = SessionLocal()
-    try:
-        if session.query(Product).first():
-            print('Тестовые данные уже загружены в БД, загрузка остановлена.')
-            return
+    file_path = os.path.join(os.path.dirname(__file__), 'vacancy.json')
+    if not os.path.exists(file_path):
+        print(
+            f'Не найден{file_path} , загрузка остановлена.'
+        )
+        return
 
-        file_path = os.path.join(os.path.dirname(__file__), 'vacancy.json')
-        if not os.path.exists(file_path):
-            print(
-                f'Не найден{file_path} , загрузка остановлена.'
-            )
-            return
+    with open(file_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+    prop_types = {}
+    prop_rows = []
+    value_rows = []
+    for prop in data.get('properties', []):
+        prop_type = PropertyType(prop['type'])
+        prop_types[prop['uid']] = prop_type
+        prop_rows.append({
+            'uid': prop['uid'],
+            'name': prop['name'],
+            'type': prop_type
+        })
+        if prop_type == PropertyType.list and 'values' in prop:
+            for val in prop['values']:
+                value_rows.append({
+                    'property_uid': prop['uid'],
+                    'value_uid': val.get('uid') or val.get('value_uid'),
+                    'value': val['value']
+                })
 
-        for prop in data.get('properties', []):
-            new_prop = Property(
-                uid=prop['uid'],
-                name=prop['name'],
-                type=PropertyType(prop['type'])
-            )
-            session.add(new_prop)
-            if new_prop.type == PropertyType.list and 'values' in prop:
-                for val in prop['values']:
-                    value_id = val.get('uid') or val.get('value_uid')
-                    new_val = PropertyValue(
-                        property_uid=new_prop.uid,
-                        value_uid=value_id,
-                        value=val['value']
-                    )
-                    session.add(new_val)
-        session.commit()
+    product_rows = []
+    product_prop_rows = []
+    for prod in data.get('products', []):
+        product_rows.append({'uid': prod['uid'], 'name': prod['name']})
+        for prod_prop in prod.get('properties', []):
+            prop_type = prop_types.get(prod_prop['uid'])
+            if prop_type is None:
+                print(
+                    f"Свойство {prod_prop['uid']} не найдено для товара\
+                    {prod['uid']}, пропускаем это свойство."
+                )
+                continue
+            is_list = prop_type == PropertyType.list
+            product_prop_rows.append({
+                'product_uid': prod['uid'],
+                'property_uid': prod_prop['uid'],
+                'value_uid': prod_prop['value_uid'] if is_list else None,
+                'int_value': None if is_list else prod_prop['value']
+            })
 
-        for prod in data.get('products', []):
-            new_product = Product(uid=prod['uid'], name=prod['name'])
-            for prod_prop in prod.get('properties', []):
-                # Проверяем, существует ли указанное свойство
-                db_prop = session.query(Property).filter(
-                    Property.uid == prod_prop['uid']
-                ).first()
-                if not db_prop:
-                    print(
-                        f"Свойство {prod_prop['uid']} не найдено для товара\
-                        {prod['uid']}, пропускаем это свойство."
+    async with SessionLocal() as session:
+        try:
+            async with session.begin():
+                new_props = set()
+                if prop_rows:
+                    new_props = set(await session.scalars(
+                        insert(Property).on_conflict_do_nothing()
+                        .returning(Property.uid),
+                        prop_rows
+                    ))
+                value_rows = [
+                    row for row in value_rows
+                    if row['property_uid'] in new_props
+                ]
+                if value_rows:
+                    await session.execute(insert(PropertyValue), value_rows)
+                new_products = set()
+                if product_rows:
+                    new_products = set(await session.scalars(
+                        insert(Product).on_conflict_do_nothing()
+                        .returning(Product.uid),
+                        product_rows
+                    ))
+                product_prop_rows = [
+                    row for row in product_prop_rows
+                    if row['product_uid'] in new_products
+                ]
+                if product_prop_rows:
+                    await session.execute(
+                        insert(ProductProperty),
+                        product_prop_rows
                     )
-                    continue
-                if db_prop.type == PropertyType.list:
-                    product_prop = ProductProperty(
-                        property_uid=prod_prop['uid'],
-                        value_uid=prod_prop['value_uid']
-                    )
-                else:
-                    product_prop = ProductProperty(
-                        property_uid=prod_prop['uid'],
-                        int_value=prod_prop['value']
-                    )
-                new_product.properties.append(product_prop)
-            session.add(new_product)
-        session.commit()
+        except Exception as e:
+            print('Ошибка при загрузке тестовых данных:', e)
+            return
 
+    if not new_props and not new_products:
+        print('Тестовые данные уже загружены в БД, загрузка остановлена.')
+    else:
         print('Тестовые данные успешно загружены в БД.')
-
-    except Exception as e:
-        session.rollback()
-        print('Ошибка при загрузке тестовых данных:', e)
-    finally:
-        session.close()
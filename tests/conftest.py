@@ -0,0 +1,61 @@
+"""Общие фикстуры тестов.
+
+Тестам нужна отдельная PostgreSQL из TEST_DATABASE_URL (переменная
+окружения или .env): при старте приложение создает в ней схему и
+загружает тестовые данные. Если переменная не задана, тесты пропускаются.
+"""
+
+import os
+from typing import Iterator, List
+
+import pytest
+from dotenv import load_dotenv
+from fastapi.testclient import TestClient
+
+load_dotenv()
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if TEST_DATABASE_URL:
+    # Подменяем БД до импорта app.database, который читает DATABASE_URL.
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+
+
+@pytest.fixture(scope='session')
+def client() -> Iterator[TestClient]:
+    """Клиент API; при старте создает схему и загружает тестовые данные."""
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL не установлен')
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def queries(client: TestClient) -> Iterator[List[str]]:
+    """Собирает SQL-запросы, выполненные движком во время теста."""
+    from sqlalchemy import event
+
+    from app.database import engine
+
+    statements: List[str] = []
+
+    def before_cursor_execute(
+            conn: object,
+            cursor: object,
+            statement: str,
+            *args: object
+    ) -> None:
+        statements.append(statement)
+
+    event.listen(
+        engine.sync_engine,
+        'before_cursor_execute',
+        before_cursor_execute
+    )
+    yield statements
+    event.remove(
+        engine.sync_engine,
+        'before_cursor_execute',
+        before_cursor_execute
+    )
@@ -0,0 +1,222 @@
+"""Тесты эндпоинтов каталога: фильтры, курсор, статистика и число запросов."""
+
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+IntBounds = Tuple[Optional[int], Optional[int]]
+
+
+def get_all_products(client: TestClient, **params: object) -> Dict[str, Any]:
+    """Возвращает ответ каталога с одной страницей на все товары."""
+    response = client.get('/catalog/', params={'page_size': 10000, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def has_property(
+        product: Dict[str, Any],
+        prop_uid: str,
+        value_uid: Optional[str] = None,
+        bounds: Optional[IntBounds] = None
+) -> bool:
+    """Проверяет, есть ли у товара свойство с подходящим значением."""
+    for prop in product['properties']:
+        if prop['uid'] != prop_uid:
+            continue
+        if value_uid is not None and prop.get('value_uid') == value_uid:
+            return True
+        if bounds is not None and prop['value'] is not None:
+            low, high = bounds
+            if (low is None or prop['value'] >= low) and (
+                    high is None or prop['value'] <= high
+            ):
+                return True
+    return False
+
+
+def find_int_property(products: List[Dict[str, Any]]) -> Tuple[str, List[int]]:
+    """Возвращает uid int-свойства и его значения у всех товаров."""
+    values: Dict[str, List[int]] = {}
+    for product in products:
+        for prop in product['properties']:
+            if 'value_uid' not in prop and prop['value'] is not None:
+                values.setdefault(prop['uid'], []).append(prop['value'])
+    prop_uid = max(values, key=lambda uid: len(values[uid]))
+    return prop_uid, sorted(values[prop_uid])
+
+
+@pytest.mark.parametrize('page_size', [1, 50])
+def test_catalog_query_count(
+        client: TestClient,
+        queries: List[str],
+        page_size: int
+) -> None:
+    """Число запросов каталога не зависит от размера страницы."""
+    from app.main import MAX_CATALOG_QUERIES
+
+    response = client.get('/catalog/', params={'page_size': page_size})
+    assert response.status_code == 200
+    assert 1 <= len(response.json()['products']) <= page_size
+    assert len(queries) <= MAX_CATALOG_QUERIES, queries
+
+
+@pytest.mark.parametrize('page_size', [1, 50])
+def test_catalog_cursor_query_count(
+        client: TestClient,
+        queries: List[str],
+        page_size: int
+) -> None:
+    """Постраничный обход по курсору тоже не порождает N+1."""
+    from app.main import MAX_CATALOG_QUERIES
+
+    first = client.get('/catalog/', params={'page_size': 1}).json()
+    queries.clear()
+    response = client.get(
+        '/catalog/',
+        params={'page_size': page_size, 'cursor': first['next_cursor']}
+    )
+    assert response.status_code == 200
+    assert response.json()['products']
+    assert len(queries) <= MAX_CATALOG_QUERIES, queries
+
+
+@pytest.mark.parametrize('sort', ['uid', 'name'])
+def test_catalog_cursor_walk(client: TestClient, sort: str) -> None:
+    """Обход по курсору возвращает каждый товар ровно один раз по порядку."""
+    expected = [
+        product['uid']
+        for product in get_all_products(client, sort=sort)['products']
+    ]
+    walked: List[str] = []
+    params: Dict[str, Any] = {'page_size': 7, 'sort': sort}
+    while True:
+        page = client.get('/catalog/', params=params).json()
+        walked.extend(product['uid'] for product in page['products'])
+        if page['next_cursor'] is None:
+            break
+        params['cursor'] = page['next_cursor']
+    assert walked == expected
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    base64.urlsafe_b64encode(b'[1]').decode(),
+    base64.urlsafe_b64encode(b'{"name": "x"}').decode(),
+])
+def test_catalog_bad_cursor(client: TestClient, cursor: str) -> None:
+    """Неразбираемый курсор отклоняется с кодом 400."""
+    response = client.get('/catalog/', params={'cursor': cursor})
+    assert response.status_code == 400
+
+
+def test_catalog_property_filters(client: TestClient) -> None:
+    """Товар проходит фильтр, только если совпали все заданные свойства."""
+    products = get_all_products(client)['products']
+    product = next(
+        product for product in products
+        if any('value_uid' in prop for prop in product['properties'])
+        and any(
+            'value_uid' not in prop and prop['value'] is not None
+            for prop in product['properties']
+        )
+    )
+    list_prop = next(
+        prop for prop in product['properties'] if 'value_uid' in prop
+    )
+    int_prop = next(
+        prop for prop in product['properties']
+        if 'value_uid' not in prop and prop['value'] is not None
+    )
+    bounds = (int_prop['value'], int_prop['value'])
+    result = get_all_products(client, **{
+        f"property_{list_prop['uid']}": list_prop['value_uid'],
+        f"property_{int_prop['uid']}_from": int_prop['value'],
+        f"property_{int_prop['uid']}_to": int_prop['value'],
+    })
+    expected = [
+        candidate['uid'] for candidate in products
+        if has_property(
+            candidate, list_prop['uid'], value_uid=list_prop['value_uid']
+        ) and has_property(candidate, int_prop['uid'], bounds=bounds)
+    ]
+    assert product['uid'] in expected
+    assert [candidate['uid'] for candidate in result['products']] == expected
+    assert result['count'] == len(expected)
+
+
+@pytest.mark.parametrize('use_from, use_to', [
+    (True, True),
+    (True, False),
+    (False, True),
+])
+def test_catalog_int_bounds(
+        client: TestClient,
+        use_from: bool,
+        use_to: bool
+) -> None:
+    """Границы from/to включаются и применяются независимо друг от друга."""
+    products = get_all_products(client)['products']
+    prop_uid, values = find_int_property(products)
+    low = values[len(values) // 4] if use_from else None
+    high = values[len(values) * 3 // 4] if use_to else None
+    params = {}
+    if low is not None:
+        params[f'property_{prop_uid}_from'] = low
+    if high is not None:
+        params[f'property_{prop_uid}_to'] = high
+    result = get_all_products(client, **params)
+    expected = [
+        product['uid'] for product in products
+        if has_property(product, prop_uid, bounds=(low, high))
+    ]
+    assert expected
+    assert [product['uid'] for product in result['products']] == expected
+
+
+def test_catalog_filter_without_filters(client: TestClient) -> None:
+    """Статистика без фильтров совпадает с посчитанной по всем товарам."""
+    products = get_all_products(client)['products']
+    value_counts: Dict[str, Dict[str, int]] = {}
+    int_values: Dict[str, List[int]] = {}
+    for product in products:
+        for prop in product['properties']:
+            if 'value_uid' in prop:
+                counts = value_counts.setdefault(prop['uid'], {})
+                counts[prop['value_uid']] = (
+                    counts.get(prop['value_uid'], 0) + 1
+                )
+            elif prop['value'] is not None:
+                int_values.setdefault(prop['uid'], []).append(prop['value'])
+    result = client.get('/catalog/filter/').json()
+    assert result.pop('count') == len(products)
+    for prop_uid, stats in result.items():
+        if 'min_value' in stats:
+            values = int_values.get(prop_uid)
+            assert stats == {
+                'min_value': min(values) if values else None,
+                'max_value': max(values) if values else None
+            }
+        else:
+            assert stats == value_counts.get(prop_uid, {})
+
+
+def test_all_facets_match_filtered_facets(client: TestClient) -> None:
+    """Статистика из pp_facets совпадает с подсчетом по всем товарам."""
+    from sqlalchemy import select
+
+    from app.database import SessionLocal
+    from app.models import Product
+    from app.routers.catalog import get_all_facets, get_filtered_facets
+
+    async def load_facets() -> Tuple[Any, Any]:
+        async with SessionLocal() as db:
+            return (
+                await get_all_facets(db),
+                await get_filtered_facets(db, select(Product.uid))
+            )
+
+    all_facets, filtered_facets = client.portal.call(load_facets)
+    assert all_facets == filtered_facets